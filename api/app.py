@@ -4,15 +4,30 @@ from flask import Flask, send_from_directory, g, request, jsonify
 from services.firestore_service import initialize_firestore  # Importa a função de inicialização
 from routes import register_blueprints  # Importa a função de registro de Blueprints
 from config import Config  # Importa a configuração (para SECRET_KEY)
-# NOVO: Importações para validação JWT
-import jwt
-import os
+from services.async_runtime import runtime
+from routes.handlers import decodificar_token  # Validação do JWT (compartilhada com asgi.py)
 
 # --- 1. INICIALIZAÇÃO DO FLASK ---
 
+class AsyncFlask(Flask):
+    """
+    Flask que executa as rotas 'async def' no event loop compartilhado (services/async_runtime.py),
+    em vez de criar um loop por requisição (o que impediria reaproveitar os clientes async).
+
+    NOTA: em WSGI a thread do worker continua bloqueada até a rota terminar; o ganho aqui é
+    apenas o paralelismo de I/O dentro de cada requisição. O modo não bloqueante é o asgi.py.
+    """
+
+    def async_to_sync(self, func):
+        def wrapper(*args, **kwargs):
+            return runtime.run(func(*args, **kwargs))
+
+        return wrapper
+
+
 # O 'static_folder='.' permite que o Flask sirva os arquivos HTML, JS e CSS estáticos
 # a partir do diretório raiz, o que é comum em arquiteturas simples de front-end/backend.
-app = Flask(__name__, static_folder='.')
+app = AsyncFlask(__name__, static_folder='.')
 app.config.from_object(Config)  # Carrega as configurações (incluindo SECRET_KEY)
 
 # 2. INICIALIZAÇÃO DO FIREBASE (Antes de registrar rotas que usam o DB)
@@ -31,35 +46,11 @@ def before_request():
     AGORA validando o Token JWT enviado no cabeçalho 'Authorization: Bearer <token>'.
     """
 
-    # 1. Obtém o cabeçalho de Autorização
-    auth_header = request.headers.get('Authorization')
-    token = None
-
-    if auth_header and auth_header.startswith('Bearer '):
-        token = auth_header.split(' ')[1]
-
-    # Popula g com valores padrão (não autenticado)
-    g.user_matricula = None
-    g.user_permissao = None
+    # Popula g com os dados do token (None se ausente/inválido)
+    g.user_matricula, g.user_permissao = decodificar_token(request.headers.get('Authorization'))
+    # O nome do usuário não está no token, mas a matrícula é suficiente
     g.user_nome = None
 
-    if token:
-        try:
-            # Tenta decodificar e validar o token usando a chave secreta
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-
-            # Se a decodificação for bem-sucedida, extrai os dados do payload e popula 'g'
-            g.user_matricula = payload.get('sub') # 'sub' (Subject) é a matrícula
-            g.user_permissao = payload.get('permissao')
-            # O nome do usuário não está no token, mas a matrícula é suficiente
-            
-        except jwt.ExpiredSignatureError:
-            print("AVISO: Token JWT Expirado.")
-        except jwt.InvalidTokenError:
-            print("ERRO: Token JWT Inválido (Assinatura, formato ou chave errada).")
-        except Exception as e:
-            print(f"ERRO: Falha crítica na validação do JWT: {e}")
-
 
 # 4. REGISTRO DOS BLUEPRINTS
 register_blueprints(app)
@@ -0,0 +1,60 @@
+"""
+Ponto de entrada para o protocolo ASGI.
+Servidores ASGI (como Uvicorn ou Hypercorn) irão procurar pela variável 'application'.
+Ex.: uvicorn asgi:application --workers 2
+
+- Rotas async de Autenticação e ERP (routes/asgi_routes.py): servidas pelo Quart no event loop
+  do servidor, sem bloquear threads durante as chamadas ao Firestore e aos Gateways.
+- Demais rotas (auditoria, dashboard, arquivos estáticos): repassadas ao app Flask (app.py)
+  em um pool de threads (a2wsgi).
+"""
+from a2wsgi import WSGIMiddleware
+from quart import Quart, g, request, jsonify
+from werkzeug.exceptions import NotFound
+
+from app import app as flask_app  # Também inicializa o Firestore
+from routes.asgi_routes import auth_async_bp, erp_async_bp
+from routes.handlers import decodificar_token
+from services.async_runtime import ServicoSobrecarregado
+
+async_app = Quart(__name__, static_folder=None)
+async_app.register_blueprint(auth_async_bp, url_prefix='/api/auth')
+async_app.register_blueprint(erp_async_bp, url_prefix='/api/erp')
+
+
+@async_app.before_request
+async def before_request():
+    """Popula o 'g' com os dados do Token JWT (mesma validação do app.py)."""
+    g.user_matricula, g.user_permissao = decodificar_token(request.headers.get('Authorization'))
+    g.user_nome = None
+
+
+@async_app.errorhandler(ServicoSobrecarregado)
+async def servico_sobrecarregado(e):
+    """Descarta a requisição (503) quando o controle de admissão a recusa, antes de qualquer efeito."""
+    response = jsonify({"message": f"Serviço temporariamente sobrecarregado: {e}", "success": False})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+
+wsgi_fallback = WSGIMiddleware(flask_app)
+_rotas_async = async_app.url_map.bind('localhost')
+
+
+def _rota_async(scope):
+    """Indica se o caminho pertence às rotas do Quart (inclusive com método não permitido)."""
+    try:
+        _rotas_async.match(scope['path'], method=scope['method'])
+    except NotFound:
+        return False
+    except Exception:
+        return True
+    return True
+
+
+async def application(scope, receive, send):
+    """Despacha cada requisição para o Quart (rotas async) ou para o Flask (demais rotas)."""
+    if scope['type'] == 'http' and not _rota_async(scope):
+        await wsgi_fallback(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
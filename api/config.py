@@ -23,3 +23,18 @@ class Config:
     PAYMENT_GATEWAY_URL = os.environ.get('PAYMENT_GATEWAY_URL', 'http://simulador.pagamento.com/api/charge')
     NFE_EMITTER_URL = os.environ.get('NFE_EMITTER_URL', 'http://simulador.nfe.com/api/emitir')
 
+    # Configurações de Auditoria (Logs particionados por período)
+    # 'mensal' (auditoria_particoes/AAAA-MM) ou 'diaria' (auditoria_particoes/AAAA-MM-DD)
+    AUDIT_PARTITION = os.environ.get('AUDIT_PARTITION', 'mensal')
+    # Partições mais antigas que este limite são compactadas e arquivadas
+    AUDIT_RETENCAO_DIAS = int(os.environ.get('AUDIT_RETENCAO_DIAS', '90'))
+    # Segredo enviado pelo Cron da Vercel (Authorization: Bearer <CRON_SECRET>)
+    CRON_SECRET = os.environ.get('CRON_SECRET')
+
+    # Configurações do modo Async (rotas 'async def')
+    # Máximo de requisições simultâneas por processo no modo ASGI (asgi.py), reduzido quando os
+    # backends ficam lentos. No modo WSGI a concorrência já é limitada pelos workers/threads.
+    ASYNC_MAX_REQUESTS = int(os.environ.get('ASYNC_MAX_REQUESTS', '64'))
+    # Latência aceitável por chamada de backend (Firestore/Gateways) antes de reduzir o limite
+    BACKEND_LATENCY_TARGET_SECONDS = float(os.environ.get('BACKEND_LATENCY_TARGET_SECONDS', '0.5'))
+    BACKEND_TIMEOUT_SECONDS = float(os.environ.get('BACKEND_TIMEOUT_SECONDS', '5'))
@@ -0,0 +1,118 @@
+# Arquivo: routes/asgi_routes.py
+#
+# Rotas async de Autenticação e ERP para o modo ASGI (asgi.py), servidas pelo Quart
+# diretamente no event loop do servidor. A lógica é a mesma das rotas Flask (routes/handlers.py).
+
+import asyncio
+from functools import wraps
+from quart import Blueprint, request, jsonify, g
+
+from services.async_runtime import runtime
+from . import handlers
+
+auth_async_bp = Blueprint('auth_async', __name__)
+erp_async_bp = Blueprint('erp_async', __name__)
+
+
+def auth_required(f):
+    """Equivalente async do decorator de routes/auth_routes.py (o 'g' é populado em asgi.py)."""
+
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if not getattr(g, 'user_matricula', None):
+            return jsonify({"message": "Autenticação necessária ou Token inválido/expirado.", "success": False}), 401
+
+        return await f(*args, **kwargs)
+
+    return decorated_function
+
+
+# Tarefas protegidas em andamento (referência forte até terminarem, mesmo sem cliente)
+_tarefas_protegidas = set()
+
+
+async def _executar_protegido(handler, args):
+    """Executa o handler e libera a vaga de admissão que a própria tarefa ocupa."""
+    try:
+        return await handler(*args)
+    finally:
+        runtime.liberar()
+
+
+def _tarefa_protegida_concluida(task):
+    """Descarta a referência e recupera a exceção (que não pode se perder sem o cliente)."""
+    _tarefas_protegidas.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"ERRO: Falha em rota protegida: {task.exception()}")
+
+
+async def _responder(handler, *args, protegido=False):
+    """
+    Executa o handler sob o controle de admissão e converte (corpo, status) em resposta.
+
+    Se 'protegido' (rotas não idempotentes), o handler roda em uma tarefa própria que não é
+    cancelada se o cliente desconectar. A vaga de admissão pertence à tarefa e só é liberada
+    quando ela termina, para que vendas/recebimentos em curso continuem contando no limite.
+    """
+    if not protegido:
+        with runtime.admissao():
+            corpo, status = await handler(*args)
+        return jsonify(corpo), status
+
+    runtime.admitir()
+    task = asyncio.ensure_future(_executar_protegido(handler, args))
+    _tarefas_protegidas.add(task)
+    task.add_done_callback(_tarefa_protegida_concluida)
+
+    corpo, status = await asyncio.shield(task)
+    return jsonify(corpo), status
+
+
+# ----------------------------------------------------------
+# AUTENTICAÇÃO
+# ----------------------------------------------------------
+
+@auth_async_bp.route('/login', methods=['POST'])
+async def login():
+    """Realiza o login e retorna o Token JWT."""
+    return await _responder(handlers.login, await request.get_json())
+
+
+# ----------------------------------------------------------
+# ERP
+# ----------------------------------------------------------
+
+@erp_async_bp.route('/produtos/cadastrar', methods=['POST'])
+@auth_required
+async def cadastrar_produto():
+    """Endpoint para salvar ou atualizar dados de um produto."""
+    return await _responder(handlers.cadastrar_produto, g.user_matricula, await request.get_json())
+
+
+@erp_async_bp.route('/produtos/buscar/<string:barcode>', methods=['GET'])
+@auth_required
+async def buscar_produto(barcode):
+    """Endpoint para buscar um produto pelo código de barras."""
+    return await _responder(handlers.buscar_produto, barcode)
+
+
+@erp_async_bp.route('/recebimento/confirmar', methods=['POST'])
+@auth_required
+async def confirmar_recebimento():
+    """Endpoint para confirmar o recebimento de uma NF-e."""
+    return await _responder(handlers.confirmar_recebimento, g.user_matricula, await request.get_json(),
+                            protegido=True)
+
+
+@erp_async_bp.route('/admin/usuarios', methods=['GET'])
+@auth_required
+async def listar_usuarios():
+    """Rota simulada para o módulo RETA (Administração de Usuários)."""
+    return await _responder(handlers.listar_usuarios, g.user_matricula, g.user_permissao)
+
+
+@erp_async_bp.route('/vendas/fechar', methods=['POST'])
+@auth_required
+async def fechar_venda():
+    """Endpoint CRÍTICO para fechar uma venda (Pagamento e NF-e). Não é cancelado no meio."""
+    return await _responder(handlers.fechar_venda, g.user_matricula, await request.get_json(), protegido=True)
@@ -1,18 +1,24 @@
 # Arquivo: routes/erp_routes.py
 
+import csv
+import io
 import random
-from flask import Blueprint, request, jsonify, g
-from firebase_admin import firestore
-from datetime import datetime, timedelta  # Novo import para simulação de KPIs
+from flask import Blueprint, request, jsonify, g, Response, stream_with_context
+from datetime import datetime, timedelta, timezone  # Novo import para simulação de KPIs
+
+from config import Config
 
 # Importações CRÍTICAS das funções de serviço
 from services.firestore_service import (
-    get_db,
     log_auditoria,
-    save_or_update_product,  # Nova Importação
-    find_product_by_barcode  # Nova Importação
+    find_users_by_matriculas,
+    query_auditoria,
+    stream_auditoria,
+    arquivar_particoes_antigas,
+    migrar_logs_legados
 )
-from services.integrations_service import IntegrationsService
+from services.auditoria_particoes import AUDIT_FILTROS
+from . import handlers  # Lógica das rotas async (compartilhada com as rotas ASGI de asgi_routes.py)
 from .auth_routes import auth_required  # Importa o decorator
 
 # Define o Blueprint para as rotas do ERP
@@ -25,45 +31,18 @@ erp_bp = Blueprint('erp', __name__)
 
 @erp_bp.route('/produtos/cadastrar', methods=['POST'])
 @auth_required
-def cadastrar_produto():
+async def cadastrar_produto():
     """Endpoint para salvar ou atualizar dados de um produto."""
-    data = request.get_json()
-    barcode = data.get('codigoBarra')
-
-    if not barcode or not data.get('nome'):
-        log_auditoria(g.user_matricula, 'Produto', 'Erro Validação', 'Dados de cadastro incompletos.')
-        return jsonify({"message": "Código de Barras e Nome são obrigatórios.", "success": False}), 400
-
-    # Adiciona a matrícula do usuário que está fazendo o cadastro
-    data['cadastrado_por'] = g.user_matricula
-
-    # Chama o serviço para salvar/atualizar no Firestore
-    success, message = save_or_update_product(data)
-
-    if success:
-        acao = "Atualização" if find_product_by_barcode(barcode) else "Cadastro"
-        log_auditoria(g.user_matricula, 'Produto', acao, f"Produto {barcode} - {data.get('nome')}")
-        return jsonify({"message": f"{acao} de produto bem-sucedido: {message}", "success": True}), 200
-    else:
-        log_auditoria(g.user_matricula, 'Produto', 'Erro DB', f"Falha ao salvar {barcode}: {message}")
-        return jsonify({"message": f"Erro ao salvar produto: {message}", "success": False}), 500
+    corpo, status = await handlers.cadastrar_produto(g.user_matricula, request.get_json())
+    return jsonify(corpo), status
 
 
 @erp_bp.route('/produtos/buscar/<string:barcode>', methods=['GET'])
 @auth_required
-def buscar_produto(barcode):
+async def buscar_produto(barcode):
     """Endpoint para buscar um produto pelo código de barras."""
-
-    if not barcode:
-        return jsonify({"message": "Código de Barras é obrigatório.", "success": False}), 400
-
-    produto = find_product_by_barcode(barcode)
-
-    if produto:
-        # log_auditoria é opcional aqui, mas pode ser útil para monitorar o PDV
-        return jsonify(produto), 200
-    else:
-        return jsonify({"message": "Produto não encontrado.", "success": False}), 404
+    corpo, status = await handlers.buscar_produto(barcode)
+    return jsonify(corpo), status
 
 
 # ----------------------------------------------------------
@@ -72,84 +51,147 @@ def buscar_produto(barcode):
 
 @erp_bp.route('/recebimento/confirmar', methods=['POST'])
 @auth_required
-def confirmar_recebimento():
+async def confirmar_recebimento():
     """Endpoint para confirmar o recebimento de uma NF-e."""
-    data = request.get_json()
-    nf_numero = data.get('nf_numero')
-    itens_nf = data.get('itens', [])
+    corpo, status = await handlers.confirmar_recebimento(g.user_matricula, request.get_json())
+    return jsonify(corpo), status
 
-    if not nf_numero or not itens_nf:
-        log_auditoria(g.user_matricula, 'Recebimento', 'Erro Validação', 'Dados de NF incompletos.')
-        return jsonify({"message": "Dados de NF incompletos.", "success": False}), 400
 
-    log_auditoria(g.user_matricula, 'Recebimento', 'Confirmação NF', f"NF {nf_numero} confirmada.")
+# ----------------------------------------------------------
+# ROTA DE ADMINISTRAÇÃO DE USUÁRIOS (RETA - Simulação)
+# ----------------------------------------------------------
 
-    # Simulação das 3 ações cruciais no recebimento (Usando Firestore Service):
-    db_instance = get_db()
-    if db_instance:
-        for item in itens_nf:
-            barcode = item.get('codigoBarra')
-            quantidade_recebida = item.get('quantidade')
-            novo_custo_liquido = item.get('custo_unitario')
+@erp_bp.route('/admin/usuarios', methods=['GET'])
+@auth_required
+async def listar_usuarios():
+    """Rota simulada para o módulo RETA (Administração de Usuários)."""
+    corpo, status = await handlers.listar_usuarios(g.user_matricula, g.user_permissao)
+    return jsonify(corpo), status
 
-            if barcode:
-                # 1. Atualizar Estoque e Custo Unitário (no Firestore)
-                # Esta lógica deve ser refinada em um sistema real para garantir transacionalidade
 
-                # Busca o produto atual para somar o estoque
-                produto_atual = find_product_by_barcode(barcode)
-                estoque_atual = produto_atual.get('estoque_atual', 0) if produto_atual else 0
+# ----------------------------------------------------------
+# ROTAS DE AUDITORIA (Consulta, Exportação e Manutenção)
+# ----------------------------------------------------------
 
-                # Novo objeto de atualização
-                update_data = {
-                    'estoque_atual': estoque_atual + quantidade_recebida,
-                    'custoLiquido': novo_custo_liquido,
-                    'last_updated': firestore.SERVER_TIMESTAMP
-                }
+def _parse_data(valor):
+    """Converte uma data ISO 8601 (query string) em datetime UTC. Lança ValueError se inválida."""
+    if not valor:
+        return None
+    data = datetime.fromisoformat(valor)
+    return data if data.tzinfo else data.replace(tzinfo=timezone.utc)
 
-                # Assume que o produto já existe ou será criado/atualizado com o novo custo
-                success, msg = save_or_update_product(update_data | item)  # Mescla dados da NF com atualização
 
-                if not success:
-                    print(f"AVISO: Falha ao atualizar produto {barcode} durante recebimento. {msg}")
+def _parametros_auditoria():
+    """Extrai filtros e intervalo de tempo da query string."""
+    filtros = {campo: request.args.get(campo) for campo in AUDIT_FILTROS if request.args.get(campo)}
+    inicio = _parse_data(request.args.get('inicio'))
+    fim = _parse_data(request.args.get('fim'))
+    return filtros, inicio, fim
 
-    # 2. Gerar Título no Contas a Pagar (simulado)
-    # Aqui, em um sistema real, você chamaria um serviço Financeiro.
-    # IntegrationsService().gerar_titulo_a_pagar(...)
 
-    # 3. Loga o Título (no Log de Auditoria)
-    log_auditoria(g.user_matricula, 'Financeiro', 'Título Gerado', f"NF {nf_numero} - R$ {data.get('valor_total')}")
+def _resumo_auditoria_recente():
+    """
+    Monta a tabela de auditoria do dashboard percorrendo TODOS os logs das últimas 2 horas
+    (em streaming, sem limite de página), para não perder usuários nem logins mais antigos.
+    Em caso de falha na consulta (ex: índice ainda não publicado), retorna a tabela vazia.
+    """
+    now = datetime.now(timezone.utc)
+    resumo = {}
+    try:
+        for log in stream_auditoria(inicio=now - timedelta(hours=2), fim=now):  # Mais recente primeiro
+            matricula = log['matricula']
+            if matricula not in resumo:
+                resumo[matricula] = {'usuario': matricula, 'acesso': '-', 'tempoLogado': '-', 'ultimaAcao': log['acao']}
+            if log['acao'] == 'Login Sucesso' and log['timestamp'] and resumo[matricula]['tempoLogado'] == '-':
+                minutos = int((now - datetime.fromisoformat(log['timestamp'])).total_seconds() // 60)
+                resumo[matricula]['tempoLogado'] = f"{minutos // 60}:{minutos % 60:02d}"
+    except Exception as e:
+        print(f"ERRO: Falha ao consultar auditoria para o dashboard: {e}")
+        return []
 
-    return jsonify({
-        "message": f"Recebimento da NF {nf_numero} concluído: Estoque e Custos atualizados, Título a Pagar gerado.",
-        "success": True
-    }), 200
+    # Uma única leitura em lote para o nível de acesso de todos os usuários
+    usuarios = find_users_by_matriculas(list(resumo))
+    for linha in resumo.values():
+        if linha['usuario'] in usuarios:
+            linha['acesso'] = usuarios[linha['usuario']].get('acesso', 'Operador')
 
+    return list(resumo.values())
 
-# ----------------------------------------------------------
-# ROTA DE ADMINISTRAÇÃO DE USUÁRIOS (RETA - Simulação)
-# ----------------------------------------------------------
 
-@erp_bp.route('/admin/usuarios', methods=['GET'])
+@erp_bp.route('/auditoria/logs', methods=['GET'])
 @auth_required
-def listar_usuarios():
-    # Rota simulada para o módulo RETA (Administração de Usuários)
+def listar_auditoria():
+    """
+    Consulta paginada dos logs de auditoria.
+    Filtros: matricula, modulo, acao, inicio, fim (ISO 8601). Paginação: limite, cursor.
+    """
+    if g.user_permissao not in ['Admin', 'Gerente']:
+        return jsonify({"message": "Acesso negado à auditoria.", "success": False}), 403
+
+    try:
+        filtros, inicio, fim = _parametros_auditoria()
+        limite = min(max(int(request.args.get('limite', 50)), 1), 500)
+        logs, proximo_cursor = query_auditoria(filtros, inicio, fim, limite, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"message": f"Parâmetros inválidos: {e}", "success": False}), 400
+    except Exception as e:
+        return jsonify({"message": f"Erro ao consultar auditoria: {e}", "success": False}), 500
+
+    return jsonify({"success": True, "logs": logs, "proximo_cursor": proximo_cursor}), 200
 
-    # Simulação: Buscar usuários do banco (Aqui estamos simulando os dados)
-    usuarios_simulados = [
-        {"matricula": "ADMIN01", "nome": "Jéssica Admin", "acesso": "Admin"},
-        {"matricula": "GERENTE01", "nome": "Roberto Gerente", "acesso": "Gerente"},
-        {"matricula": "OP001", "nome": "Carlos Operador", "acesso": "Operador"},
-    ]
 
-    # No seu front-end (reta.html), você verificará a permissão, mas o backend também deve fazê-lo
+@erp_bp.route('/auditoria/exportar', methods=['GET'])
+@auth_required
+def exportar_auditoria():
+    """Exporta (em streaming, formato CSV) todos os logs que atendem aos filtros."""
     if g.user_permissao not in ['Admin', 'Gerente']:
-        log_auditoria(g.user_matricula, 'RETA', 'Acesso Negado',
-                      'Tentativa de listar usuários sem permissão Admin/Gerente.')
-        return jsonify({"message": "Acesso negado. Requer permissão de Admin ou Gerente.", "success": False}), 403
+        return jsonify({"message": "Acesso negado à auditoria.", "success": False}), 403
+
+    try:
+        filtros, inicio, fim = _parametros_auditoria()
+    except ValueError as e:
+        return jsonify({"message": f"Parâmetros inválidos: {e}", "success": False}), 400
+
+    log_auditoria(g.user_matricula, 'Auditoria', 'Exportação', f"Filtros: {filtros}")
+    colunas = ['timestamp', 'matricula', 'modulo', 'acao', 'detalhe', 'particao', 'id']
+
+    def gerar_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=colunas, extrasaction='ignore')
+        writer.writeheader()
+        for log in stream_auditoria(filtros, inicio, fim):
+            writer.writerow(log)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    return Response(
+        stream_with_context(gerar_csv()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=auditoria.csv'}
+    )
+
+
+@erp_bp.route('/auditoria/manutencao', methods=['GET', 'POST'])
+def manutencao_auditoria():
+    """
+    Migra os logs do formato antigo e compacta/arquiva partições fora da janela de retenção.
+    Chamado diariamente pelo Cron da Vercel (Authorization: Bearer <CRON_SECRET>) ou por um Admin.
+    """
+    cron_autorizado = bool(Config.CRON_SECRET) and \
+        request.headers.get('Authorization') == f"Bearer {Config.CRON_SECRET}"
+
+    if not cron_autorizado and g.user_permissao != 'Admin':
+        return jsonify({"message": "Acesso negado. Requer permissão de Admin.", "success": False}), 403
 
-    # Em um sistema real, buscaria da coleção 'usuarios'
-    return jsonify(usuarios_simulados), 200
+    # Primeiro move as entradas do formato antigo (coleção plana) para as partições
+    migradas = migrar_logs_legados()
+    arquivadas = arquivar_particoes_antigas()
+    log_auditoria(g.user_matricula or 'CRON', 'Auditoria', 'Arquivamento',
+                  f"Migradas: {migradas}. Partições: {arquivadas}")
+
+    return jsonify({"success": True, "logs_migrados": migradas, "particoes_arquivadas": arquivadas}), 200
 
 
 # ----------------------------------------------------------
@@ -175,15 +217,8 @@ def get_kpis():
     itens_ponto_pedido = random.randint(15, 30)
     estoque_total_valor = round(random.uniform(150000.00, 300000.00), 2)
 
-    # 3. Auditoria Simulação (para a tabela de Auditoria no dashboard.html)
-    # Gerar logs simulados de acessos e ações recentes (das últimas 2 horas)
-    now = datetime.now()
-    auditoria_logs = [
-        {'usuario': 'ADMIN01', 'acesso': 'Admin', 'tempoLogado': '1:45', 'ultimaAcao': 'Consulta KPI'},
-        {'usuario': 'GERENTE01', 'acesso': 'Gerente', 'tempoLogado': '2:10', 'ultimaAcao': 'Confirma NF 1234'},
-        {'usuario': 'OP001', 'acesso': 'Operador', 'tempoLogado': '0:30', 'ultimaAcao': 'Venda #987'},
-        {'usuario': 'OP002', 'acesso': 'Operador', 'tempoLogado': '1:00', 'ultimaAcao': 'Busca Produto'},
-    ]
+    # 3. Auditoria (tabela de Auditoria no dashboard.html): última ação de cada usuário
+    auditoria_logs = _resumo_auditoria_recente()
 
     return jsonify({
         "success": True,
@@ -203,87 +238,9 @@ def get_kpis():
 
 @erp_bp.route('/vendas/fechar', methods=['POST'])
 @auth_required
-def fechar_venda():
+async def fechar_venda():
     """
     Endpoint CRÍTICO para fechar uma venda, incluindo Pagamento e NF-e.
     """
-    db = get_db()
-    data = request.get_json()
-
-    # Validação inicial dos dados
-    itens = data.get('itens', [])
-    valor_total = data.get('valor_total')
-
-    if not itens or not valor_total:
-        log_auditoria(g.user_matricula, 'PDV', 'Erro Validação', 'Dados de venda incompletos.')
-        return jsonify({"message": "Dados de venda incompletos.", "success": False}), 400
-
-    # 1. INICIALIZA o serviço de integração
-    integrations = IntegrationsService(g.user_matricula)
-
-    # 2. PROCESSA o Pagamento
-    dados_pagamento = data.get('dados_pagamento', {})
-    pagamento_result = integrations.processar_pagamento(valor_total, dados_pagamento)
-
-    if pagamento_result['status'] == 'NEGADO':
-        return jsonify({"message": "Pagamento negado pelo Gateway.", "success": False}), 402
-
-    # 3. REGISTRA a Venda no Banco de Dados (Firestore)
-    venda_id = f"VENDA_{datetime.now().strftime('%Y%m%d%H%M%S')}_{random.randint(100, 999)}"
-
-    venda_record = {
-        'id_venda': venda_id,
-        'timestamp': firestore.SERVER_TIMESTAMP,
-        'matricula_operador': g.user_matricula,
-        'valor_total': valor_total,
-        'itens': itens,  # Itens da venda
-        'status': 'APROVADA',
-        'transacao_id': pagamento_result.get('transaction_id')
-    }
-
-    try:
-        db.collection('vendas').document(venda_id).set(venda_record)
-        log_auditoria(g.user_matricula, 'PDV', 'Venda Registrada', f"ID: {venda_id}")
-
-        # 4. ATUALIZA Estoque e Loga no Log de Auditoria
-        for item in itens:
-            barcode = item.get('codigoBarra')
-            quantidade_vendida = item.get('quantidade')
-
-            # Atualização de Estoque (decremento) - Lógica de serviço de produto
-            # Buscar produto atual
-            produto_atual = find_product_by_barcode(barcode)
-            if produto_atual:
-                novo_estoque = max(0, produto_atual.get('estoque_atual', 0) - quantidade_vendida)
-
-                # Chamar o serviço para atualizar o estoque
-                update_data = {'estoque_atual': novo_estoque}
-                save_or_update_product(update_data | item)  # Mescla dados e atualiza (Apenas o estoque mudou aqui)
-
-            log_auditoria(g.user_matricula, 'Estoque', 'Saída Mercadoria', f"Produto {barcode} -{quantidade_vendida}un")
-
-        # 5. EMITE a Nota Fiscal Eletrônica (NF-e)
-        nfe_result = integrations.emitir_nfe(venda_record, itens)
-
-        if nfe_result['status'] == 'AUTORIZADO':
-            log_auditoria(g.user_matricula, 'Fiscal', 'NF-e Autorizada', f"Chave: {nfe_result['chave_acesso']}")
-            db.collection('vendas').document(venda_id).update({
-                'nfe_chave': nfe_result['chave_acesso'],
-                'status': 'FINALIZADA'
-            })
-        else:
-            # Caso de Contingência (emissão de Cupom Fiscal ou NF-e em contingência)
-            log_auditoria(g.user_matricula, 'Fiscal', 'NF-e Falha', f"Venda {venda_id}")
-            db.collection('vendas').document(venda_id).update({'status': 'CONTINGÊNCIA'})
-
-        # SUCESSO FINAL
-        return jsonify({
-            "message": "Venda finalizada com sucesso! Pagamento Aprovado e NF-e Emitida.",
-            "success": True,
-            "venda_id": venda_id,
-            "chave_nfe": nfe_result.get('chave_acesso', 'Contingência')
-        }), 200
-
-    except Exception as e:
-        log_auditoria(g.user_matricula, 'PDV', 'Erro Crítico', f"Venda {venda_id} falhou: {e}")
-        return jsonify({"message": f"Erro interno ao finalizar a venda: {e}", "success": False}), 500
\ No newline at end of file
+    corpo, status = await handlers.fechar_venda(g.user_matricula, request.get_json())
+    return jsonify(corpo), status
\ No newline at end of file
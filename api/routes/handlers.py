@@ -0,0 +1,361 @@
+# Arquivo: routes/handlers.py
+#
+# Lógica das rotas async de Autenticação e ERP, independente de framework.
+# Cada handler recebe os dados já extraídos da requisição (matrícula/permissão do token, corpo JSON)
+# e retorna a tupla (corpo, status). É usada pelas rotas Flask (auth_routes.py/erp_routes.py, WSGI)
+# e pelas rotas Quart (asgi_routes.py, ASGI).
+
+import asyncio
+import random
+import jwt
+from datetime import datetime, timedelta
+from firebase_admin import firestore
+from werkzeug.security import check_password_hash # CRÍTICO: Importa a função de segurança
+
+from config import Config # Para acessar a JWT_SECRET_KEY
+from services.async_runtime import runtime
+from services.firestore_async_service import (
+    get_async_db,
+    log_auditoria_async,
+    save_or_update_product_async,
+    find_product_by_barcode_async,
+    decrementar_estoque_async,
+    find_user_by_matricula_async
+)
+from services.integrations_service import IntegrationsService
+
+
+def decodificar_token(auth_header):
+    """
+    Valida o Token JWT do cabeçalho 'Authorization: Bearer <token>'.
+    Retorna (matricula, permissao), ou (None, None) se ausente/inválido.
+    """
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None, None
+
+    token = auth_header.split(' ')[1]
+    try:
+        # Tenta decodificar e validar o token usando a chave secreta
+        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
+        # 'sub' (Subject) é a matrícula
+        return payload.get('sub'), payload.get('permissao')
+    except jwt.ExpiredSignatureError:
+        print("AVISO: Token JWT Expirado.")
+    except jwt.InvalidTokenError:
+        print("ERRO: Token JWT Inválido (Assinatura, formato ou chave errada).")
+    except Exception as e:
+        print(f"ERRO: Falha crítica na validação do JWT: {e}")
+    return None, None
+
+
+# ----------------------------------------------------------
+# AUTENTICAÇÃO
+# ----------------------------------------------------------
+
+async def login(data):
+    """
+    Realiza o login verificando as credenciais (Matrícula e Senha-Hash) no Firestore.
+    Em caso de sucesso, gera um Token JWT e o retorna ao frontend.
+    """
+    matricula = data.get('matricula')
+    senha_digitada = data.get('senha')
+
+    if not matricula or not senha_digitada:
+        await log_auditoria_async('DESCONHECIDO', 'Autenticação', 'Erro Validação', 'Matrícula ou senha ausente.')
+        return {"message": "Matrícula e senha são obrigatórias.", "success": False}, 400
+
+    # 1. Busca o usuário no Firestore pela Matrícula (que é o ID do documento)
+    user_data = await find_user_by_matricula_async(matricula)
+
+    if not user_data:
+        await log_auditoria_async(matricula, 'Autenticação', 'Falha Login', 'Matrícula inexistente.')
+        return {"message": "Matrícula ou senha inválida.", "success": False}, 401
+
+    # 2. Verifica a Senha: Compara a senha digitada com o HASH armazenado no DB
+    senha_hash = user_data.get('senha_hash')
+
+    if not senha_hash:
+        await log_auditoria_async(matricula, 'Autenticação', 'Falha Login', 'Usuário sem hash de senha no DB.')
+        return {"message": "Erro de segurança: Hash de senha ausente.", "success": False}, 500
+
+    try:
+        # O hash é custoso (CPU): roda fora do event loop para não travar as demais requisições
+        if await asyncio.to_thread(check_password_hash, senha_hash, senha_digitada):
+            # Login bem-sucedido
+            await log_auditoria_async(matricula, 'Autenticação', 'Login Sucesso')
+
+            # --- GERAÇÃO DO TOKEN JWT (CRÍTICO) ---
+            payload = {
+                # 'exp': Token expira em 2 horas
+                'exp': datetime.utcnow() + timedelta(hours=2),
+                'iat': datetime.utcnow(),  # Issued at (quando foi criado)
+                'sub': matricula,  # Subject (identificador único do usuário)
+                'permissao': user_data.get('acesso', 'Operador') # Permissão do usuário
+            }
+
+            # Codifica o token usando a chave secreta e o algoritmo HS256
+            token = jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+            # Retorna dados essenciais para o Frontend salvar no sessionStorage
+            return {
+                "message": "Login bem-sucedido.",
+                "success": True,
+                "user_matricula": matricula,
+                "user_nome": user_data.get('nome', matricula),
+                # Nível de Acesso: 'Admin', 'Gerente', 'Operador'
+                "user_permissao": user_data.get('acesso', 'Operador'),
+                "token": token # <<< NOVO CAMPO
+            }, 200
+        else:
+            # Senha incorreta
+            await log_auditoria_async(matricula, 'Autenticação', 'Falha Login', 'Senha incorreta.')
+            return {"message": "Matrícula ou senha inválida.", "success": False}, 401
+    except Exception as e:
+        await log_auditoria_async(matricula, 'Autenticação', 'Erro Crítico', f'Falha na verificação de hash/geração de token: {e}')
+        # Em caso de erro na geração do token (ex: chave secreta ausente/inválida), retorna 500
+        return {"message": "Erro interno do servidor ao gerar token.", "success": False}, 500
+
+
+# ----------------------------------------------------------
+# PRODUTOS (Módulo de Cadastro e Consulta)
+# ----------------------------------------------------------
+
+async def cadastrar_produto(matricula, data):
+    """Endpoint para salvar ou atualizar dados de um produto."""
+    barcode = data.get('codigoBarra')
+
+    if not barcode or not data.get('nome'):
+        await log_auditoria_async(matricula, 'Produto', 'Erro Validação', 'Dados de cadastro incompletos.')
+        return {"message": "Código de Barras e Nome são obrigatórios.", "success": False}, 400
+
+    # Adiciona a matrícula do usuário que está fazendo o cadastro
+    data['cadastrado_por'] = matricula
+
+    # Verifica se o produto já existe (antes de salvar) para diferenciar Cadastro de Atualização
+    existente = await find_product_by_barcode_async(barcode)
+    acao = "Atualização" if existente else "Cadastro"
+
+    # Chama o serviço para salvar/atualizar no Firestore
+    success, message = await save_or_update_product_async(data)
+
+    if success:
+        await log_auditoria_async(matricula, 'Produto', acao, f"Produto {barcode} - {data.get('nome')}")
+        return {"message": f"{acao} de produto bem-sucedido: {message}", "success": True}, 200
+    else:
+        await log_auditoria_async(matricula, 'Produto', 'Erro DB', f"Falha ao salvar {barcode}: {message}")
+        return {"message": f"Erro ao salvar produto: {message}", "success": False}, 500
+
+
+async def buscar_produto(barcode):
+    """Endpoint para buscar um produto pelo código de barras."""
+
+    if not barcode:
+        return {"message": "Código de Barras é obrigatório.", "success": False}, 400
+
+    produto = await find_product_by_barcode_async(barcode)
+
+    if produto:
+        # log_auditoria é opcional aqui, mas pode ser útil para monitorar o PDV
+        return produto, 200
+    else:
+        return {"message": "Produto não encontrado.", "success": False}, 404
+
+
+# ----------------------------------------------------------
+# RECEBIMENTO DE NF-e (Integração)
+# ----------------------------------------------------------
+
+async def confirmar_recebimento(matricula, data):
+    """Endpoint para confirmar o recebimento de uma NF-e."""
+    nf_numero = data.get('nf_numero')
+    itens_nf = data.get('itens', [])
+
+    if not nf_numero or not itens_nf:
+        await log_auditoria_async(matricula, 'Recebimento', 'Erro Validação', 'Dados de NF incompletos.')
+        return {"message": "Dados de NF incompletos.", "success": False}, 400
+
+    # Simulação das 3 ações cruciais no recebimento (Usando Firestore Service):
+    itens_validos = [item for item in itens_nf if item.get('codigoBarra')] if get_async_db() else []
+
+    # 1. Atualizar Estoque e Custo Unitário (no Firestore)
+    # O estoque é somado com firestore.Increment (atômico no servidor): dispensa a leitura prévia
+    # e soma corretamente NFs com mais de uma linha para o mesmo código de barras.
+    atualizacoes = []
+    for item in itens_validos:
+        # Novo objeto de atualização
+        update_data = {
+            'estoque_atual': firestore.Increment(item.get('quantidade')),
+            'custoLiquido': item.get('custo_unitario'),
+            'last_updated': firestore.SERVER_TIMESTAMP
+        }
+
+        # Assume que o produto já existe ou será criado/atualizado com o novo custo
+        atualizacoes.append(save_or_update_product_async(update_data | item))  # Mescla dados da NF com atualização
+
+    # O log de confirmação e as atualizações de estoque são independentes: rodam em paralelo
+    _, *resultados = await asyncio.gather(
+        log_auditoria_async(matricula, 'Recebimento', 'Confirmação NF', f"NF {nf_numero} confirmada."),
+        *atualizacoes
+    )
+
+    for item, (success, msg) in zip(itens_validos, resultados):
+        if not success:
+            print(f"AVISO: Falha ao atualizar produto {item['codigoBarra']} durante recebimento. {msg}")
+
+    # 2. Gerar Título no Contas a Pagar (simulado)
+    # Aqui, em um sistema real, você chamaria um serviço Financeiro.
+    # IntegrationsService().gerar_titulo_a_pagar(...)
+
+    # 3. Loga o Título (no Log de Auditoria)
+    await log_auditoria_async(matricula, 'Financeiro', 'Título Gerado', f"NF {nf_numero} - R$ {data.get('valor_total')}")
+
+    return {
+        "message": f"Recebimento da NF {nf_numero} concluído: Estoque e Custos atualizados, Título a Pagar gerado.",
+        "success": True
+    }, 200
+
+
+# ----------------------------------------------------------
+# ADMINISTRAÇÃO DE USUÁRIOS (RETA - Simulação)
+# ----------------------------------------------------------
+
+async def listar_usuarios(matricula, permissao):
+    """Rota simulada para o módulo RETA (Administração de Usuários)."""
+
+    # Simulação: Buscar usuários do banco (Aqui estamos simulando os dados)
+    usuarios_simulados = [
+        {"matricula": "ADMIN01", "nome": "Jéssica Admin", "acesso": "Admin"},
+        {"matricula": "GERENTE01", "nome": "Roberto Gerente", "acesso": "Gerente"},
+        {"matricula": "OP001", "nome": "Carlos Operador", "acesso": "Operador"},
+    ]
+
+    # No seu front-end (reta.html), você verificará a permissão, mas o backend também deve fazê-lo
+    if permissao not in ['Admin', 'Gerente']:
+        await log_auditoria_async(matricula, 'RETA', 'Acesso Negado',
+                      'Tentativa de listar usuários sem permissão Admin/Gerente.')
+        return {"message": "Acesso negado. Requer permissão de Admin ou Gerente.", "success": False}, 403
+
+    # Em um sistema real, buscaria da coleção 'usuarios'
+    return usuarios_simulados, 200
+
+
+# ----------------------------------------------------------
+# FECHAMENTO DE VENDA (PDV)
+# ----------------------------------------------------------
+
+async def fechar_venda(matricula, data):
+    """
+    Endpoint CRÍTICO para fechar uma venda, incluindo Pagamento e NF-e.
+
+    Após o pagamento aprovado, nenhuma escrita é cancelada por timeout (runtime.medir_backend),
+    e a resposta informa exatamente o que foi concluído (venda registrada, estoque, status).
+    """
+    db = get_async_db()
+
+    # Validação inicial dos dados
+    itens = data.get('itens', [])
+    valor_total = data.get('valor_total')
+
+    if not itens or not valor_total:
+        await log_auditoria_async(matricula, 'PDV', 'Erro Validação', 'Dados de venda incompletos.')
+        return {"message": "Dados de venda incompletos.", "success": False}, 400
+
+    # Sem banco não há como registrar a venda: recusa ANTES de cobrar
+    if not db:
+        await log_auditoria_async(matricula, 'PDV', 'Erro DB', 'Venda recusada: banco de dados não conectado.')
+        return {"message": "Banco de dados indisponível. Nenhuma cobrança foi feita.", "success": False}, 503
+
+    # 1. INICIALIZA o serviço de integração
+    integrations = IntegrationsService(matricula)
+
+    # 2. PROCESSA o Pagamento
+    dados_pagamento = data.get('dados_pagamento', {})
+    pagamento_result = await integrations.processar_pagamento_async(valor_total, dados_pagamento)
+
+    if pagamento_result['status'] == 'NEGADO':
+        return {"message": "Pagamento negado pelo Gateway.", "success": False}, 402
+
+    # 3. REGISTRA a Venda no Banco de Dados (Firestore)
+    venda_id = f"VENDA_{datetime.now().strftime('%Y%m%d%H%M%S')}_{random.randint(100, 999)}"
+    transacao_id = pagamento_result.get('transaction_id')
+
+    venda_record = {
+        'id_venda': venda_id,
+        'timestamp': firestore.SERVER_TIMESTAMP,
+        'matricula_operador': matricula,
+        'valor_total': valor_total,
+        'itens': itens,  # Itens da venda
+        'status': 'APROVADA',
+        'transacao_id': transacao_id
+    }
+    venda_ref = db.collection('vendas').document(venda_id)
+
+    try:
+        await runtime.medir_backend(venda_ref.set(venda_record))
+    except Exception as e:
+        await log_auditoria_async(matricula, 'PDV', 'Erro Crítico',
+                                  f"Venda {venda_id} não registrada após pagamento aprovado ({transacao_id}): {e}")
+        return {
+            "message": "Pagamento APROVADO, mas a venda não foi registrada. Não repita a cobrança: "
+                       "informe o suporte com o ID da transação.",
+            "success": False,
+            "pagamento_aprovado": True,
+            "venda_registrada": False,
+            "venda_id": venda_id,
+            "transacao_id": transacao_id
+        }, 500
+
+    # 4. ATUALIZA Estoque e Loga no Log de Auditoria (EMITE a NF-e em paralelo)
+    # Agrupa as linhas por código de barras: uma baixa (transacional) por produto
+    vendidos = {}
+    for item in itens:
+        barcode = item.get('codigoBarra')
+        if barcode:
+            anterior = vendidos.get(barcode, (None, 0))[1]
+            vendidos[barcode] = (item, anterior + item.get('quantidade'))
+
+    nfe_result, *resultados = await asyncio.gather(
+        integrations.emitir_nfe_async(venda_record, itens),
+        *(decrementar_estoque_async(barcode, quantidade, item) for barcode, (item, quantidade) in vendidos.items()),
+        log_auditoria_async(matricula, 'PDV', 'Venda Registrada', f"ID: {venda_id}"),
+        *(log_auditoria_async(matricula, 'Estoque', 'Saída Mercadoria',
+                              f"Produto {item.get('codigoBarra')} -{item.get('quantidade')}un") for item in itens)
+    )
+
+    estoque_pendente = [
+        barcode for barcode, (success, _) in zip(vendidos, resultados[:len(vendidos)]) if not success
+    ]
+    if estoque_pendente:
+        await log_auditoria_async(matricula, 'Estoque', 'Baixa Pendente', f"Venda {venda_id}: {estoque_pendente}")
+
+    # 5. ATUALIZA o status conforme a NF-e
+    if nfe_result['status'] == 'AUTORIZADO':
+        status = 'FINALIZADA'
+        atualizacao = {'nfe_chave': nfe_result['chave_acesso'], 'status': status}
+        await log_auditoria_async(matricula, 'Fiscal', 'NF-e Autorizada', f"Chave: {nfe_result['chave_acesso']}")
+    else:
+        # Caso de Contingência (emissão de Cupom Fiscal ou NF-e em contingência)
+        status = 'CONTINGÊNCIA'
+        atualizacao = {'status': status}
+        await log_auditoria_async(matricula, 'Fiscal', 'NF-e Falha', f"Venda {venda_id}")
+
+    try:
+        await runtime.medir_backend(venda_ref.update(atualizacao))
+        status_gravado = True
+    except Exception as e:
+        status_gravado = False
+        await log_auditoria_async(matricula, 'PDV', 'Erro DB', f"Venda {venda_id}: status {status} não gravado: {e}")
+
+    # SUCESSO FINAL (pagamento aprovado e venda registrada; pendências informadas explicitamente)
+    mensagem = ("Venda finalizada com sucesso! Pagamento Aprovado e NF-e Emitida." if status == 'FINALIZADA'
+                else "Venda registrada com Pagamento Aprovado. NF-e em contingência.")
+    return {
+        "message": mensagem,
+        "success": True,
+        "venda_id": venda_id,
+        "transacao_id": transacao_id,
+        "status": status,
+        "status_gravado": status_gravado,
+        "estoque_pendente": estoque_pendente,
+        "chave_nfe": nfe_result.get('chave_acesso', 'Contingência')
+    }, 200
@@ -0,0 +1,136 @@
+# Arquivo: services/async_runtime.py
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+
+class ServicoSobrecarregado(Exception):
+    """Requisição recusada pelo controle de admissão (backends lentos ou muitas requisições em curso)."""
+
+
+class AsyncRuntime:
+    """
+    Suporte às rotas 'async def' nos dois modos de serviço:
+
+    - ASGI (asgi.py): as rotas rodam no event loop do servidor. O controle de admissão (admissao)
+      limita as requisições em curso no processo; o limite cai quando a latência dos backends sobe.
+    - WSGI (wsgi.py): as rotas rodam em um event loop compartilhado, em uma thread dedicada (run).
+      A thread do worker fica bloqueada até a rota terminar: o ganho é só o paralelismo de I/O
+      dentro da requisição, e a concorrência continua igual ao número de workers/threads.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._em_andamento = 0
+        self._latencia_media = 0.0  # Média móvel exponencial (segundos)
+
+    @property
+    def loop(self):
+        """Retorna o event loop compartilhado do modo WSGI, iniciando a thread na primeira chamada."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='async-runtime', daemon=True).start()
+        return self._loop
+
+    # ------------------------------------------------------
+    # Controle de admissão (modo ASGI)
+    # ------------------------------------------------------
+
+    def limite_atual(self):
+        """Limite de requisições simultâneas, reduzido proporcionalmente à latência dos backends."""
+        alvo = Config.BACKEND_LATENCY_TARGET_SECONDS
+        if self._latencia_media <= alvo:
+            return Config.ASYNC_MAX_REQUESTS
+        return max(1, int(Config.ASYNC_MAX_REQUESTS * alvo / self._latencia_media))
+
+    def registrar_latencia(self, segundos):
+        """Atualiza a média móvel da latência dos backends."""
+        self._latencia_media = 0.8 * self._latencia_media + 0.2 * segundos
+
+    async def chamada_backend(self, awaitable):
+        """Aguarda uma chamada de I/O com timeout, registrando sua latência."""
+        inicio = time.monotonic()
+        try:
+            return await asyncio.wait_for(awaitable, timeout=Config.BACKEND_TIMEOUT_SECONDS)
+        finally:
+            self.registrar_latencia(time.monotonic() - inicio)
+
+    async def medir_backend(self, awaitable):
+        """
+        Aguarda uma chamada de I/O SEM timeout que a cancele, apenas registrando sua latência.
+        Usada nas escritas após o pagamento aprovado: cancelar a espera não desfaz uma escrita
+        que o servidor ainda pode confirmar, e deixaria a venda em estado desconhecido.
+        """
+        inicio = time.monotonic()
+        try:
+            return await awaitable
+        finally:
+            self.registrar_latencia(time.monotonic() - inicio)
+
+    def admitir(self):
+        """
+        Ocupa uma vaga ou lança ServicoSobrecarregado ANTES de qualquer efeito colateral,
+        de modo que a resposta 503 seja sempre segura para o cliente repetir.
+        Quem admite deve chamar liberar() ao terminar.
+        """
+        with self._lock:
+            if self._em_andamento >= self.limite_atual():
+                raise ServicoSobrecarregado("Limite de requisições simultâneas atingido.")
+            self._em_andamento += 1
+
+    def liberar(self):
+        """Libera a vaga ocupada por admitir()."""
+        with self._lock:
+            self._em_andamento -= 1
+
+    @contextmanager
+    def admissao(self):
+        """Ocupa uma vaga (admitir) durante o bloco 'with'."""
+        self.admitir()
+        try:
+            yield
+        finally:
+            self.liberar()
+
+    # ------------------------------------------------------
+    # Execução (modo WSGI)
+    # ------------------------------------------------------
+
+    def run(self, coro):
+        """
+        Executa a corrotina no loop compartilhado e aguarda o resultado.
+        Não há timeout global nem cancelamento: cancelar no meio deixaria rotas como a venda pela
+        metade. Cada chamada de backend tem seu próprio timeout (chamada_backend), exceto as
+        escritas após o pagamento aprovado (medir_backend).
+        """
+        loop = self.loop
+        # Copia o contexto da requisição (request, g) para a Task criada no loop
+        ctx = contextvars.copy_context()
+        resultado = concurrent.futures.Future()
+
+        def _propagar(task):
+            if task.cancelled():
+                resultado.cancel()
+            elif task.exception() is not None:
+                resultado.set_exception(task.exception())
+            else:
+                resultado.set_result(task.result())
+
+        def _iniciar():
+            task = ctx.run(loop.create_task, coro)
+            task.add_done_callback(_propagar)
+
+        loop.call_soon_threadsafe(_iniciar)
+        return resultado.result()
+
+
+# Instância única do processo (usada pelo app.py, asgi.py e pelos serviços async)
+runtime = AsyncRuntime()
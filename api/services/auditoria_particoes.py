@@ -0,0 +1,74 @@
+# Arquivo: services/auditoria_particoes.py
+#
+# Particionamento dos logs de auditoria, compartilhado pelos serviços síncrono
+# (firestore_service.py) e assíncrono (firestore_async_service.py).
+#
+# Estrutura no Firestore:
+#   auditoria_particoes/{particao}                 -> metadados da partição ('inicio', 'status')
+#   auditoria_particoes/{particao}/registros/{id}  -> entradas de log
+#   auditoria_arquivo/{particao}/blocos/{id}       -> entradas compactadas de partições antigas
+#   auditoria_logs/{id}                            -> formato antigo (coleção única); migrado para as
+#                                                     partições pela rotina de manutenção
+#
+# Como todas as subcoleções se chamam 'registros', um único conjunto de índices
+# compostos (firestore.indexes.json) atende todas as partições.
+
+from datetime import datetime, timezone
+from firebase_admin import firestore
+
+from config import Config
+
+AUDIT_COLLECTION = 'auditoria_particoes'
+AUDIT_LEGACY_COLLECTION = 'auditoria_logs'
+AUDIT_SUBCOLLECTION = 'registros'
+AUDIT_ARCHIVE_COLLECTION = 'auditoria_arquivo'
+AUDIT_FILTROS = ('matricula', 'modulo', 'acao')
+AUDIT_BLOCO_ARQUIVO = 400  # Entradas por documento compactado (limite de 1 MiB por documento)
+
+# Partições já registradas por este processo (evita regravar os metadados a cada log)
+_particoes_registradas = set()
+
+
+def inicio_particao(momento):
+    """Retorna o instante inicial (UTC) da partição que contém 'momento'."""
+    if Config.AUDIT_PARTITION == 'diaria':
+        return datetime(momento.year, momento.month, momento.day, tzinfo=timezone.utc)
+    return datetime(momento.year, momento.month, 1, tzinfo=timezone.utc)
+
+
+def nome_particao(momento):
+    """Retorna o ID da partição: 'AAAA-MM' (mensal) ou 'AAAA-MM-DD' (diária)."""
+    if Config.AUDIT_PARTITION == 'diaria':
+        return momento.strftime('%Y-%m-%d')
+    return momento.strftime('%Y-%m')
+
+
+def metadados_particao_pendentes(momento):
+    """
+    Retorna os metadados a gravar no documento da partição de 'momento',
+    ou None se este processo já a registrou.
+    """
+    if nome_particao(momento) in _particoes_registradas:
+        return None
+    return {'inicio': inicio_particao(momento), 'status': 'ativa'}
+
+
+def marcar_particao_registrada(nome):
+    """Marca a partição como registrada neste processo."""
+    _particoes_registradas.add(nome)
+
+
+def esquecer_particao(nome):
+    """Remove a partição do cache local (ex: após o arquivamento)."""
+    _particoes_registradas.discard(nome)
+
+
+def registro_auditoria(matricula, modulo, acao, detalhe=""):
+    """Monta o documento de uma entrada de log de auditoria."""
+    return {
+        'timestamp': firestore.SERVER_TIMESTAMP,
+        'matricula': matricula,
+        'modulo': modulo,
+        'acao': acao,
+        'detalhe': detalhe
+    }
@@ -0,0 +1,157 @@
+# Arquivo: services/firestore_async_service.py
+#
+# Versões assíncronas (AsyncClient do Firestore) das funções de firestore_service.py,
+# usadas pelas rotas async (routes/handlers.py).
+
+import asyncio
+from datetime import datetime, timezone
+import firebase_admin
+from google.cloud import firestore as gcloud_firestore
+
+from services.async_runtime import runtime
+from services.firestore_service import get_db
+from services.auditoria_particoes import (
+    AUDIT_COLLECTION,
+    AUDIT_SUBCOLLECTION,
+    nome_particao,
+    metadados_particao_pendentes,
+    marcar_particao_registrada,
+    registro_auditoria
+)
+
+# Cliente async único, vinculado ao event loop da primeira chamada
+# (loop do servidor em ASGI, ou o loop compartilhado de services/async_runtime.py em WSGI)
+async_db = None
+
+
+def get_async_db():
+    """Retorna o cliente async do Firestore, reaproveitando as credenciais do firebase_admin."""
+    global async_db
+    if async_db is None and get_db() is not None:
+        app = firebase_admin.get_app()
+        async_db = gcloud_firestore.AsyncClient(
+            project=app.project_id,
+            credentials=app.credential.get_credential()
+        )
+    return async_db
+
+
+async def log_auditoria_async(matricula, modulo, acao, detalhe=""):
+    """Registra uma ação na partição corrente de auditoria_particoes."""
+    db_instance = get_async_db()
+    if not db_instance:
+        print(f"AVISO: Log de auditoria falhou. DB não inicializado: {modulo} - {acao}")
+        return
+
+    try:
+        momento = datetime.now(timezone.utc)
+        nome = nome_particao(momento)
+        particao_ref = db_instance.collection(AUDIT_COLLECTION).document(nome)
+
+        # A entrada e os metadados da partição (se pendentes) são gravados em paralelo
+        escritas = [particao_ref.collection(AUDIT_SUBCOLLECTION).add(registro_auditoria(matricula, modulo, acao, detalhe))]
+        metadados = metadados_particao_pendentes(momento)
+        if metadados:
+            escritas.append(particao_ref.set(metadados, merge=True))
+
+        await runtime.chamada_backend(asyncio.gather(*escritas))
+        marcar_particao_registrada(nome)
+    except Exception as e:
+        print(f"ERRO: Falha ao registrar log de auditoria: {e}")
+
+
+# ==========================================================
+# FUNÇÕES DE PRODUTO
+# ==========================================================
+
+async def save_or_update_product_async(product_data):
+    """
+    Salva ou atualiza um produto na coleção 'produtos'.
+    Usa o 'codigoBarra' como ID do documento.
+    """
+    db_instance = get_async_db()
+    if not db_instance:
+        return False, "Banco de dados não conectado."
+
+    barcode = product_data.get('codigoBarra')
+    if not barcode:
+        return False, "Código de Barras ausente."
+
+    product_data['last_updated'] = gcloud_firestore.SERVER_TIMESTAMP
+
+    try:
+        await runtime.chamada_backend(
+            db_instance.collection('produtos').document(barcode).set(product_data, merge=True)
+        )
+        return True, "Produto salvo com sucesso."
+    except Exception as e:
+        print(f"ERRO ao salvar produto {barcode}: {e}")
+        return False, f"Erro interno ao salvar produto: {e}"
+
+
+async def find_product_by_barcode_async(barcode):
+    """Busca um produto pelo código de barras na coleção 'produtos'."""
+    db_instance = get_async_db()
+    if not db_instance:
+        return None
+
+    try:
+        doc = await runtime.chamada_backend(db_instance.collection('produtos').document(barcode).get())
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        print(f"ERRO ao buscar produto {barcode}: {e}")
+        return None
+
+
+@gcloud_firestore.async_transactional
+async def _decrementar_estoque(transaction, produto_ref, quantidade, dados_item):
+    """Lê e grava o estoque na mesma transação (repetida pelo cliente em caso de conflito)."""
+    snapshot = await produto_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+
+    estoque_atual = snapshot.to_dict().get('estoque_atual', 0)
+    transaction.set(produto_ref, dados_item | {
+        'estoque_atual': max(0, estoque_atual - quantidade),
+        'last_updated': gcloud_firestore.SERVER_TIMESTAMP
+    }, merge=True)
+    return True
+
+
+async def decrementar_estoque_async(barcode, quantidade, dados_item):
+    """
+    Dá baixa no estoque (mínimo 0) em uma transação, para que vendas simultâneas do mesmo
+    produto não percam decrementos. Sem timeout que cancele: roda após o pagamento aprovado.
+    Retorna (sucesso, mensagem).
+    """
+    db_instance = get_async_db()
+    if not db_instance:
+        return False, "Banco de dados não conectado."
+
+    try:
+        produto_ref = db_instance.collection('produtos').document(barcode)
+        existe = await runtime.medir_backend(
+            _decrementar_estoque(db_instance.transaction(), produto_ref, quantidade, dados_item)
+        )
+        return existe, "Estoque atualizado." if existe else "Produto não cadastrado."
+    except Exception as e:
+        print(f"ERRO ao dar baixa no estoque do produto {barcode}: {e}")
+        return False, f"Erro interno ao atualizar estoque: {e}"
+
+
+# ==========================================================
+# 🔑 FUNÇÃO DE USUÁRIO (CRÍTICO para AuthRoutes)
+# ==========================================================
+
+async def find_user_by_matricula_async(matricula):
+    """Busca um usuário pela matrícula (ID do documento) na coleção 'usuarios'."""
+    db_instance = get_async_db()
+    if not db_instance:
+        return None
+
+    try:
+        doc = await runtime.chamada_backend(db_instance.collection('usuarios').document(matricula).get())
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        print(f"ERRO ao buscar usuário {matricula}: {e}")
+        return None
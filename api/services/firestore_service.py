@@ -2,12 +2,28 @@
 
 import os
 import json
-from datetime import datetime
+import base64
+from datetime import datetime, timedelta, timezone
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 
 # Importa a configuração para obter a chave (CRÍTICO para o Vercel)
 from config import Config
+from services.auditoria_particoes import (
+    AUDIT_COLLECTION,
+    AUDIT_LEGACY_COLLECTION,
+    AUDIT_SUBCOLLECTION,
+    AUDIT_ARCHIVE_COLLECTION,
+    AUDIT_FILTROS,
+    AUDIT_BLOCO_ARQUIVO,
+    inicio_particao,
+    nome_particao,
+    metadados_particao_pendentes,
+    marcar_particao_registrada,
+    esquecer_particao,
+    registro_auditoria
+)
 
 # Variável global para armazenar a instância do Firestore
 db = None
@@ -51,25 +67,272 @@ def get_db():
     return db
 
 
+# ==========================================================
+# 📜 FUNÇÕES DE AUDITORIA (Logs particionados por período)
+# ==========================================================
+# Estrutura e helpers de particionamento: services/auditoria_particoes.py
+
 def log_auditoria(matricula, modulo, acao, detalhe=""):
-    """Registra uma ação na coleção de auditoria_logs."""
+    """Registra uma ação na partição corrente de auditoria_particoes."""
     db_instance = get_db()
     if not db_instance:
         print(f"AVISO: Log de auditoria falhou. DB não inicializado: {modulo} - {acao}")
         return
 
     try:
-        db_instance.collection('auditoria_logs').add({
-            'timestamp': firestore.SERVER_TIMESTAMP,
-            'matricula': matricula,
-            'modulo': modulo,
-            'acao': acao,
-            'detalhe': detalhe
-        })
+        momento = datetime.now(timezone.utc)
+        nome = nome_particao(momento)
+        particao_ref = db_instance.collection(AUDIT_COLLECTION).document(nome)
+
+        metadados = metadados_particao_pendentes(momento)
+        if metadados:
+            particao_ref.set(metadados, merge=True)
+        particao_ref.collection(AUDIT_SUBCOLLECTION).add(registro_auditoria(matricula, modulo, acao, detalhe))
+        marcar_particao_registrada(nome)
     except Exception as e:
         print(f"ERRO: Falha ao registrar log de auditoria: {e}")
 
 
+def encode_cursor_auditoria(particao, doc_id):
+    """Gera o cursor opaco de paginação a partir da última entrada retornada."""
+    raw = json.dumps({'p': particao, 'id': doc_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor_auditoria(cursor):
+    """Decodifica o cursor de paginação. Lança ValueError se for inválido."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return data['p'], data['id']
+    except Exception:
+        raise ValueError("Cursor de paginação inválido.")
+
+
+def _particoes_no_intervalo(db_instance, inicio, fim):
+    """Lista (mais recente primeiro) as partições ativas que podem conter logs entre inicio e fim."""
+    query = (db_instance.collection(AUDIT_COLLECTION)
+             .where(filter=FieldFilter('inicio', '<', fim))
+             .order_by('inicio', direction=firestore.Query.DESCENDING))
+
+    particoes = []
+    for doc in query.stream():
+        dados = doc.to_dict()
+        if dados.get('status') == 'arquivada':
+            continue
+        particoes.append(doc)
+        # Partições são contíguas: a primeira que começa antes de 'inicio' é a última relevante
+        if dados.get('inicio') and dados['inicio'] <= inicio:
+            break
+    return particoes
+
+
+def _query_particao(particao_ref, filtros, inicio, fim):
+    """Monta a consulta ordenada (mais recente primeiro) dentro de uma partição."""
+    query = particao_ref.collection(AUDIT_SUBCOLLECTION)
+    for campo in AUDIT_FILTROS:
+        valor = filtros.get(campo)
+        if valor:
+            query = query.where(filter=FieldFilter(campo, '==', valor))
+    return (query
+            .where(filter=FieldFilter('timestamp', '>=', inicio))
+            .where(filter=FieldFilter('timestamp', '<', fim))
+            .order_by('timestamp', direction=firestore.Query.DESCENDING))
+
+
+def _intervalo_padrao(inicio, fim):
+    """Aplica o intervalo padrão (janela de retenção até agora) quando não informado."""
+    fim = fim or datetime.now(timezone.utc)
+    inicio = inicio or fim - timedelta(days=Config.AUDIT_RETENCAO_DIAS)
+    return inicio, fim
+
+
+def _serializar_log(doc, particao):
+    """Converte um documento de log em dicionário serializável em JSON."""
+    dados = doc.to_dict()
+    timestamp = dados.get('timestamp')
+    return {
+        'id': doc.id,
+        'particao': particao,
+        'timestamp': timestamp.isoformat() if timestamp else None,
+        'matricula': dados.get('matricula'),
+        'modulo': dados.get('modulo'),
+        'acao': dados.get('acao'),
+        'detalhe': dados.get('detalhe', '')
+    }
+
+
+def query_auditoria(filtros=None, inicio=None, fim=None, limite=50, cursor=None):
+    """
+    Consulta logs de auditoria com filtros por 'matricula', 'modulo' e 'acao',
+    percorrendo as partições da mais recente para a mais antiga.
+
+    Retorna (logs, proximo_cursor). 'proximo_cursor' é None quando não há mais páginas.
+    """
+    # Valida o cursor antes de tudo: cursor inválido é erro do cliente (400), com ou sem DB
+    cursor_particao, cursor_id = decode_cursor_auditoria(cursor) if cursor else (None, None)
+
+    db_instance = get_db()
+    if not db_instance:
+        return [], None
+
+    filtros = filtros or {}
+    inicio, fim = _intervalo_padrao(inicio, fim)
+
+    logs = []
+    ultimo = None
+    for particao_doc in _particoes_no_intervalo(db_instance, inicio, fim):
+        particao = particao_doc.id
+        # Partições mais recentes que a do cursor já foram entregues nas páginas anteriores
+        if cursor_particao and particao > cursor_particao:
+            continue
+
+        query = _query_particao(particao_doc.reference, filtros, inicio, fim)
+        if cursor_particao == particao:
+            snapshot = particao_doc.reference.collection(AUDIT_SUBCOLLECTION).document(cursor_id).get()
+            if snapshot.exists:
+                query = query.start_after(snapshot)
+        cursor_particao = None
+
+        # Busca um item extra para saber se existe próxima página
+        for doc in query.limit(limite - len(logs) + 1).stream():
+            if len(logs) == limite:
+                return logs, encode_cursor_auditoria(*ultimo)
+            logs.append(_serializar_log(doc, particao))
+            ultimo = (particao, doc.id)
+
+    return logs, None
+
+
+def stream_auditoria(filtros=None, inicio=None, fim=None):
+    """Gerador que percorre todos os logs filtrados (sem paginação), para exportação."""
+    db_instance = get_db()
+    if not db_instance:
+        return
+
+    filtros = filtros or {}
+    inicio, fim = _intervalo_padrao(inicio, fim)
+
+    for particao_doc in _particoes_no_intervalo(db_instance, inicio, fim):
+        for doc in _query_particao(particao_doc.reference, filtros, inicio, fim).stream():
+            yield _serializar_log(doc, particao_doc.id)
+
+
+def migrar_logs_legados():
+    """
+    Migração (única) das entradas do formato antigo, gravadas diretamente na coleção plana
+    'auditoria_logs', para as partições de 'auditoria_particoes' (mantendo o ID de cada entrada).
+    Cada lote é copiado e apagado no mesmo batch: a migração pode ser interrompida e retomada.
+
+    Retorna o número de entradas migradas.
+    """
+    db_instance = get_db()
+    if not db_instance:
+        return 0
+
+    legado_ref = db_instance.collection(AUDIT_LEGACY_COLLECTION)
+    migradas = 0
+    try:
+        while True:
+            # 200 entradas x 2 escritas (+ metadados das partições) cabem no limite de 500 do batch
+            docs = list(legado_ref.limit(200).stream())
+            if not docs:
+                break
+
+            batch = db_instance.batch()
+            particoes_do_lote = set()
+            for doc in docs:
+                dados = doc.to_dict()
+                momento = dados.get('timestamp') or datetime.now(timezone.utc)
+                particao_ref = db_instance.collection(AUDIT_COLLECTION).document(nome_particao(momento))
+
+                if particao_ref.id not in particoes_do_lote:
+                    # Partições antigas voltam a 'ativa' e são (re)arquivadas na mesma manutenção
+                    batch.set(particao_ref, {'inicio': inicio_particao(momento), 'status': 'ativa'}, merge=True)
+                    particoes_do_lote.add(particao_ref.id)
+
+                batch.set(particao_ref.collection(AUDIT_SUBCOLLECTION).document(doc.id), dados)
+                batch.delete(doc.reference)
+            batch.commit()
+
+            migradas += len(docs)
+    except Exception as e:
+        print(f"ERRO: Falha ao migrar logs de auditoria do formato antigo: {e}")
+
+    return migradas
+
+
+def _id_bloco_arquivo(primeiro_doc):
+    """ID do bloco compactado: timestamp + ID do primeiro registro (estável entre execuções)."""
+    timestamp = primeiro_doc.to_dict().get('timestamp')
+    prefixo = timestamp.strftime('%Y%m%dT%H%M%S%f') if timestamp else '00000000T000000000000'
+    return f"{prefixo}_{primeiro_doc.id}"
+
+
+def arquivar_particoes_antigas(agora=None):
+    """
+    Compacta e arquiva as partições que saíram da janela de retenção (AUDIT_RETENCAO_DIAS).
+    As entradas são agrupadas em blocos em 'auditoria_arquivo' e removidas da partição original.
+
+    Cada bloco é gravado no mesmo batch que apaga seus registros de origem, e seu ID deriva do
+    primeiro registro: uma execução interrompida (erro ou timeout do Cron) é retomada de onde parou,
+    sem sobrescrever blocos já arquivados.
+
+    Retorna a lista de partições arquivadas.
+    """
+    db_instance = get_db()
+    if not db_instance:
+        return []
+
+    agora = agora or datetime.now(timezone.utc)
+    # Só arquiva partições que terminaram antes do corte (a partição do corte ainda é consultável)
+    corte = inicio_particao(agora - timedelta(days=Config.AUDIT_RETENCAO_DIAS))
+
+    arquivadas = []
+    query = db_instance.collection(AUDIT_COLLECTION).where(filter=FieldFilter('inicio', '<', corte))
+    for particao_doc in query.stream():
+        dados_particao = particao_doc.to_dict()
+        if dados_particao.get('status') == 'arquivada':
+            continue
+
+        particao = particao_doc.id
+        registros_ref = particao_doc.reference.collection(AUDIT_SUBCOLLECTION)
+        arquivo_ref = db_instance.collection(AUDIT_ARCHIVE_COLLECTION).document(particao)
+
+        try:
+            particao_doc.reference.update({'status': 'arquivando'})
+
+            while True:
+                docs = list(registros_ref.order_by('timestamp').limit(AUDIT_BLOCO_ARQUIVO).stream())
+                if not docs:
+                    break
+
+                batch = db_instance.batch()
+                batch.set(arquivo_ref.collection('blocos').document(_id_bloco_arquivo(docs[0])), {
+                    'registros': [dict(doc.to_dict(), id=doc.id) for doc in docs]
+                })
+                batch.set(arquivo_ref, {
+                    'inicio': dados_particao.get('inicio'),
+                    'total': firestore.Increment(len(docs)),
+                    'blocos': firestore.Increment(1)
+                }, merge=True)
+                for doc in docs:
+                    batch.delete(doc.reference)
+                batch.commit()
+
+            total = (arquivo_ref.get().to_dict() or {}).get('total', 0)
+            particao_doc.reference.update({
+                'status': 'arquivada',
+                'arquivada_em': firestore.SERVER_TIMESTAMP,
+                'total': total
+            })
+            esquecer_particao(particao)
+            arquivadas.append(particao)
+        except Exception as e:
+            print(f"ERRO: Falha ao arquivar partição de auditoria {particao}: {e}")
+
+    return arquivadas
+
+
 # ==========================================================
 # FUNÇÕES DE PRODUTO
 # ==========================================================
@@ -145,3 +408,20 @@ def find_user_by_matricula(matricula):
     except Exception as e:
         print(f"ERRO ao buscar usuário {matricula}: {e}")
         return None
+
+
+def find_users_by_matriculas(matriculas):
+    """
+    Busca vários usuários em uma única leitura em lote (get_all).
+    Retorna um dicionário {matricula: dados_do_usuario} apenas com os usuários existentes.
+    """
+    db_instance = get_db()
+    if not db_instance or not matriculas:
+        return {}
+
+    try:
+        refs = [db_instance.collection('usuarios').document(m) for m in matriculas if m and '/' not in m]
+        return {doc.id: doc.to_dict() for doc in db_instance.get_all(refs) if doc.exists}
+    except Exception as e:
+        print(f"ERRO ao buscar usuários {matriculas}: {e}")
+        return {}
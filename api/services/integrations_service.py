@@ -1,6 +1,18 @@
-import requests
+import asyncio
+import httpx
 from config import Config
-from services.firestore_service import log_auditoria
+from services.async_runtime import runtime
+
+# Cliente HTTP async compartilhado (pool de conexões), vinculado ao event loop da primeira chamada
+_http_client = None
+
+
+def get_http_client():
+    """Retorna o cliente HTTP async, criando-o na primeira chamada."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=Config.BACKEND_TIMEOUT_SECONDS)
+    return _http_client
 
 
 class IntegrationsService:
@@ -9,27 +21,43 @@ class IntegrationsService:
     def __init__(self, matricula_operador):
         self.matricula_operador = matricula_operador
 
-    # Exemplo de Correção (dentro de IntegrationsService)
-
-    def processar_pagamento(self, valor_total, dados_pagamento):
-        # ... código de logs omitido ...
-
-        # --- SUBSTITUIR SIMULAÇÃO POR CHAMADA REAL ---
+    async def processar_pagamento_async(self, valor_total, dados_pagamento):
+        """Envia a cobrança ao Gateway de Pagamento sem bloquear o event loop."""
         try:
             payload = {"valor": valor_total, "dados": dados_pagamento}
-            # IMPORTANTE: Você precisará de 'requests' instalado (pip install requests)
-            response = requests.post(Config.PAYMENT_GATEWAY_URL, json=payload, timeout=5)
-            response.raise_for_status()  # Lança exceção para status 4xx/5xx
+            response = await runtime.chamada_backend(
+                get_http_client().post(Config.PAYMENT_GATEWAY_URL, json=payload)
+            )
+            response.raise_for_status()
 
-            # Analise a resposta real da API de Pagamento
             api_response = response.json()
             if api_response.get("status") == "APROVADO":
-                # ... loga sucesso ...
                 return {"status": "APROVADO", "transaction_id": api_response.get("id")}
             else:
-                # ... loga falha ...
                 return {"status": "NEGADO", "motivo": api_response.get("motivo")}
 
-        except requests.exceptions.RequestException as e:
-            # ... loga erro de conexão ou HTTP ...
-            return {"status": "NEGADO", "motivo": f"Erro de conexão com o Gateway: {e}"}
\ No newline at end of file
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            return {"status": "NEGADO", "motivo": f"Erro de conexão com o Gateway: {e}"}
+
+    async def emitir_nfe_async(self, venda_record, itens):
+        """Solicita a emissão da NF-e ao emissor. Em caso de falha, a venda segue em contingência."""
+        try:
+            payload = {
+                "id_venda": venda_record.get('id_venda'),
+                "valor_total": venda_record.get('valor_total'),
+                "operador": self.matricula_operador,
+                "itens": itens
+            }
+            response = await runtime.chamada_backend(
+                get_http_client().post(Config.NFE_EMITTER_URL, json=payload)
+            )
+            response.raise_for_status()
+
+            api_response = response.json()
+            if api_response.get("status") == "AUTORIZADO":
+                return {"status": "AUTORIZADO", "chave_acesso": api_response.get("chave_acesso")}
+            else:
+                return {"status": "REJEITADO", "motivo": api_response.get("motivo")}
+
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            return {"status": "REJEITADO", "motivo": f"Erro de conexão com o Emissor de NF-e: {e}"}
@@ -0,0 +1,24 @@
+# Arquivo: tests/conftest.py
+
+import jwt
+import pytest
+
+from config import Config
+from services import firestore_service, auditoria_particoes
+from tests.fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Substitui o cliente Firestore por um em memória e limpa o cache de partições."""
+    db = FakeFirestore()
+    monkeypatch.setattr(firestore_service, 'db', db)
+    monkeypatch.setattr(Config, 'AUDIT_PARTITION', 'mensal')
+    monkeypatch.setattr(auditoria_particoes, '_particoes_registradas', set())
+    return db
+
+
+def token_para(matricula, permissao):
+    """Gera o cabeçalho Authorization com um JWT válido."""
+    token = jwt.encode({'sub': matricula, 'permissao': permissao}, Config.JWT_SECRET_KEY, algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
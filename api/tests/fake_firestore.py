@@ -0,0 +1,168 @@
+# Arquivo: tests/fake_firestore.py
+#
+# Firestore em memória (cliente síncrono) com o subconjunto da API usado por services/firestore_service.py:
+# coleções/subcoleções, where(filter=FieldFilter), order_by, limit, start_after, batch e get_all.
+
+import operator
+from datetime import datetime, timezone
+from firebase_admin import firestore
+
+_OPERADORES = {
+    '==': operator.eq,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _aplicar_transforms(atual, dados):
+    """Resolve SERVER_TIMESTAMP e Increment como o servidor faria."""
+    resultado = {}
+    for campo, valor in dados.items():
+        if valor is firestore.SERVER_TIMESTAMP:
+            valor = datetime.now(timezone.utc)
+        elif isinstance(valor, firestore.Increment):
+            valor = (atual or {}).get(campo, 0) + valor.value
+        resultado[campo] = valor
+    return resultado
+
+
+class FakeSnapshot:
+    def __init__(self, reference, dados):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = dados is not None
+        self._dados = dados
+
+    def to_dict(self):
+        return dict(self._dados) if self._dados is not None else None
+
+
+class FakeDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, nome):
+        return FakeCollection(self._client, self.path + (nome,))
+
+    def get(self):
+        return FakeSnapshot(self, self._client.docs.get(self.path))
+
+    def set(self, dados, merge=False):
+        atual = self._client.docs.get(self.path)
+        novos = _aplicar_transforms(atual, dados)
+        self._client.docs[self.path] = {**atual, **novos} if (merge and atual) else novos
+
+    def update(self, dados):
+        if self.path not in self._client.docs:
+            raise KeyError(f"Documento inexistente: {'/'.join(self.path)}")
+        self.set(dados, merge=True)
+
+    def delete(self):
+        self._client.docs.pop(self.path, None)
+
+
+class FakeQuery:
+    def __init__(self, client, path, filtros=(), ordens=(), limite=None, apos=None):
+        self._client = client
+        self._path = path
+        self._filtros = filtros
+        self._ordens = ordens
+        self._limite = limite
+        self._apos = apos
+
+    def _copiar(self, **kwargs):
+        atual = dict(filtros=self._filtros, ordens=self._ordens, limite=self._limite, apos=self._apos)
+        atual.update(kwargs)
+        return FakeQuery(self._client, self._path, **atual)
+
+    def where(self, filter):
+        return self._copiar(filtros=self._filtros + ((filter.field_path, filter.op_string, filter.value),))
+
+    def order_by(self, campo, direction='ASCENDING'):
+        return self._copiar(ordens=self._ordens + ((campo, direction),))
+
+    def limit(self, n):
+        return self._copiar(limite=n)
+
+    def start_after(self, snapshot):
+        return self._copiar(apos=snapshot.reference.path)
+
+    def stream(self):
+        docs = [
+            (path, dados) for path, dados in self._client.docs.items()
+            if len(path) == len(self._path) + 1 and path[:-1] == self._path
+        ]
+        docs = [
+            (path, dados) for path, dados in docs
+            if all(campo in dados and _OPERADORES[op](dados[campo], valor) for campo, op, valor in self._filtros)
+        ]
+        for campo, direcao in reversed(self._ordens):
+            docs.sort(key=lambda item: item[1][campo], reverse=(direcao == firestore.Query.DESCENDING))
+
+        if self._apos is not None:
+            caminhos = [path for path, _ in docs]
+            docs = docs[caminhos.index(self._apos) + 1:] if self._apos in caminhos else docs
+
+        if self._limite is not None:
+            docs = docs[:self._limite]
+
+        return iter([FakeSnapshot(FakeDocumentReference(self._client, path), dict(dados)) for path, dados in docs])
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = path[-1]
+
+    def document(self, doc_id=None):
+        self._client.contador_ids += 1
+        return FakeDocumentReference(self._client, self._path + (doc_id or f"auto{self._client.contador_ids:06d}",))
+
+    def add(self, dados):
+        ref = self.document()
+        ref.set(dados)
+        return None, ref
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self._client = client
+        self._operacoes = []
+
+    def set(self, ref, dados, merge=False):
+        self._operacoes.append(lambda: ref.set(dados, merge=merge))
+
+    def update(self, ref, dados):
+        self._operacoes.append(lambda: ref.update(dados))
+
+    def delete(self, ref):
+        self._operacoes.append(ref.delete)
+
+    def commit(self):
+        # Atômico: ou todas as operações são aplicadas, ou nenhuma
+        self._client.commits += 1
+        if self._client.falhar_no_commit == self._client.commits:
+            raise RuntimeError("Falha simulada no commit do batch.")
+        for operacao in self._operacoes:
+            operacao()
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.docs = {}
+        self.contador_ids = 0
+        self.commits = 0
+        self.falhar_no_commit = None  # Número do commit que deve falhar (simula erro/timeout)
+
+    def collection(self, nome):
+        return FakeCollection(self, (nome,))
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, refs):
+        return [ref.get() for ref in refs]
@@ -0,0 +1,161 @@
+# Arquivo: tests/test_asgi.py
+
+import asyncio
+
+import httpx
+import pytest
+
+import asgi
+from config import Config
+from routes import asgi_routes, handlers
+from services.async_runtime import runtime
+from tests.conftest import token_para
+
+
+@pytest.fixture(autouse=True)
+def runtime_limpo(monkeypatch):
+    """Isola o estado de admissão do runtime (instância única do processo)."""
+    monkeypatch.setattr(runtime, '_em_andamento', 0)
+    monkeypatch.setattr(runtime, '_latencia_media', 0.0)
+    monkeypatch.setattr(Config, 'ASYNC_MAX_REQUESTS', 64)
+    monkeypatch.setattr(Config, 'BACKEND_LATENCY_TARGET_SECONDS', 0.5)
+
+
+@pytest.fixture
+def destinos(monkeypatch):
+    """Registra qual app (Quart ou Flask) atendeu cada requisição."""
+    registro = []
+    quart_app, flask_fallback = asgi.async_app, asgi.wsgi_fallback
+
+    async def via_quart(scope, receive, send):
+        registro.append('quart')
+        await quart_app(scope, receive, send)
+
+    async def via_flask(scope, receive, send):
+        registro.append('flask')
+        await flask_fallback(scope, receive, send)
+
+    monkeypatch.setattr(asgi, 'async_app', via_quart)
+    monkeypatch.setattr(asgi, 'wsgi_fallback', via_flask)
+    return registro
+
+
+def _requisitar(metodo, caminho, **kwargs):
+    async def _enviar():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url='http://teste') as client:
+            return await client.request(metodo, caminho, **kwargs)
+
+    return asyncio.run(_enviar())
+
+
+# ----------------------------------------------------------
+# Despacho: Quart (rotas async) x Flask (demais rotas)
+# ----------------------------------------------------------
+
+@pytest.mark.parametrize('metodo, caminho, destino', [
+    ('POST', '/api/auth/login', 'quart'),
+    ('GET', '/api/erp/produtos/buscar/789', 'quart'),
+    ('POST', '/api/erp/vendas/fechar', 'quart'),
+    ('POST', '/api/erp/recebimento/confirmar', 'quart'),
+    ('GET', '/api/erp/admin/usuarios', 'quart'),
+    ('GET', '/api/erp/dashboard/kpis', 'flask'),
+    ('GET', '/api/erp/auditoria/logs', 'flask'),
+    ('GET', '/api/erp/auditoria/exportar', 'flask'),
+    ('GET', '/index.html', 'flask'),
+])
+def test_despacho_por_rota(fake_db, destinos, metodo, caminho, destino):
+    _requisitar(metodo, caminho, headers=token_para('ADMIN01', 'Admin'), json={})
+
+    assert destinos == [destino]
+
+
+def test_metodo_nao_permitido_em_rota_async_retorna_405_pelo_quart(fake_db, destinos):
+    response = _requisitar('GET', '/api/auth/login')
+
+    assert response.status_code == 405
+    assert destinos == ['quart']
+
+
+def test_rotas_flask_respondem_pelo_fallback(fake_db, destinos):
+    response = _requisitar('GET', '/api/erp/dashboard/kpis', headers=token_para('ADMIN01', 'Admin'))
+
+    assert response.status_code == 200
+    assert response.json()['auditoria'] == []
+
+
+# ----------------------------------------------------------
+# Controle de admissão
+# ----------------------------------------------------------
+
+def test_limite_cai_com_a_latencia_dos_backends(monkeypatch):
+    assert runtime.limite_atual() == 64
+
+    monkeypatch.setattr(runtime, '_latencia_media', 5.0)  # 10x o alvo de 0,5s
+
+    assert runtime.limite_atual() == 6
+
+
+def test_latencia_acima_do_alvo_retorna_503_antes_do_handler(monkeypatch):
+    chamadas = []
+
+    async def handler_espiao(barcode):
+        chamadas.append(barcode)
+        return {}, 200
+
+    monkeypatch.setattr(handlers, 'buscar_produto', handler_espiao)
+    monkeypatch.setattr(runtime, '_latencia_media', 5.0)
+    monkeypatch.setattr(runtime, '_em_andamento', runtime.limite_atual())  # Vagas esgotadas
+
+    response = _requisitar('GET', '/api/erp/produtos/buscar/789', headers=token_para('OP001', 'Operador'))
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert response.json()['success'] is False
+    assert chamadas == []
+
+
+def test_mesma_carga_e_admitida_com_latencia_normal(monkeypatch):
+    async def handler_espiao(barcode):
+        return {"codigoBarra": barcode}, 200
+
+    monkeypatch.setattr(handlers, 'buscar_produto', handler_espiao)
+    monkeypatch.setattr(runtime, '_em_andamento', 6)
+
+    response = _requisitar('GET', '/api/erp/produtos/buscar/789', headers=token_para('OP001', 'Operador'))
+
+    assert response.status_code == 200
+    assert runtime._em_andamento == 6  # A vaga foi liberada ao final
+
+
+def test_rota_protegida_mantem_a_vaga_apos_desconexao_do_cliente(capsys):
+    async def cenario():
+        liberar_handler = asyncio.Event()
+
+        async def venda(falhar):
+            await liberar_handler.wait()
+            if falhar:
+                raise RuntimeError("gateway caiu")
+            return {"success": True}, 200
+
+        async with asgi.async_app.app_context():
+            for falhar in (False, True):
+                requisicao = asyncio.ensure_future(asgi_routes._responder(venda, falhar, protegido=True))
+                await asyncio.sleep(0)
+                assert runtime._em_andamento == 1
+
+                # Cliente desconecta: a requisição é cancelada, mas a venda continua e ocupa a vaga
+                requisicao.cancel()
+                await asyncio.gather(requisicao, return_exceptions=True)
+                assert runtime._em_andamento == 1
+
+                liberar_handler.set()
+                while asgi_routes._tarefas_protegidas:
+                    await asyncio.sleep(0)
+                assert runtime._em_andamento == 0
+                liberar_handler.clear()
+
+    asyncio.run(cenario())
+
+    # A exceção da tarefa protegida é recuperada e registrada, não perdida
+    assert "ERRO: Falha em rota protegida: gateway caiu" in capsys.readouterr().out
@@ -0,0 +1,152 @@
+# Arquivo: tests/test_auditoria.py
+
+from datetime import datetime, timezone
+
+from services import firestore_service
+from services.auditoria_particoes import (
+    AUDIT_COLLECTION,
+    AUDIT_LEGACY_COLLECTION,
+    AUDIT_SUBCOLLECTION,
+    AUDIT_ARCHIVE_COLLECTION
+)
+from tests.conftest import token_para
+
+
+def _utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def _criar_particao(db, nome, inicio, timestamps, status='ativa'):
+    """Cria a partição e suas entradas; retorna os IDs na ordem dos timestamps informados."""
+    particao_ref = db.collection(AUDIT_COLLECTION).document(nome)
+    particao_ref.set({'inicio': inicio, 'status': status})
+    ids = []
+    for i, timestamp in enumerate(timestamps):
+        doc_id = f"{nome}-{i}"
+        particao_ref.collection(AUDIT_SUBCOLLECTION).document(doc_id).set({
+            'timestamp': timestamp, 'matricula': 'OP001', 'modulo': 'PDV', 'acao': 'Venda', 'detalhe': ''
+        })
+        ids.append(doc_id)
+    return ids
+
+
+# ----------------------------------------------------------
+# Paginação por cursor entre partições
+# ----------------------------------------------------------
+
+def _duas_particoes(db):
+    outubro = _criar_particao(db, '2026-10', _utc(2026, 10, 1),
+                              [_utc(2026, 10, 3), _utc(2026, 10, 2), _utc(2026, 10, 1, 12)])
+    setembro = _criar_particao(db, '2026-09', _utc(2026, 9, 1), [_utc(2026, 9, 20), _utc(2026, 9, 10)])
+    return outubro, setembro
+
+
+def test_pagina_que_termina_na_fronteira_da_particao(fake_db):
+    outubro, setembro = _duas_particoes(fake_db)
+    intervalo = dict(inicio=_utc(2026, 9, 1), fim=_utc(2026, 11, 1))
+
+    pagina1, cursor = firestore_service.query_auditoria(limite=3, **intervalo)
+    assert [log['id'] for log in pagina1] == outubro
+    assert cursor is not None  # Ainda há entradas na partição seguinte
+
+    pagina2, cursor = firestore_service.query_auditoria(limite=3, cursor=cursor, **intervalo)
+    assert [log['id'] for log in pagina2] == setembro
+    assert cursor is None
+
+
+def test_ultima_pagina_exata_nao_retorna_cursor(fake_db):
+    outubro, setembro = _duas_particoes(fake_db)
+
+    logs, cursor = firestore_service.query_auditoria(inicio=_utc(2026, 9, 1), fim=_utc(2026, 11, 1), limite=5)
+
+    assert [log['id'] for log in logs] == outubro + setembro
+    assert cursor is None
+
+
+def test_paginas_atravessam_particoes_sem_repetir(fake_db):
+    outubro, setembro = _duas_particoes(fake_db)
+    intervalo = dict(inicio=_utc(2026, 9, 1), fim=_utc(2026, 11, 1))
+
+    vistos, cursor = [], None
+    while True:
+        logs, cursor = firestore_service.query_auditoria(limite=2, cursor=cursor, **intervalo)
+        vistos += [log['id'] for log in logs]
+        if cursor is None:
+            break
+
+    assert vistos == outubro + setembro
+
+
+def test_cursor_invalido_retorna_400(fake_db):
+    from app import app
+
+    response = app.test_client().get('/api/erp/auditoria/logs?cursor=nao-e-um-cursor',
+                                     headers=token_para('ADMIN01', 'Admin'))
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+# ----------------------------------------------------------
+# Arquivamento (compactação) de partições antigas
+# ----------------------------------------------------------
+
+def _blocos(db, particao):
+    prefixo = (AUDIT_ARCHIVE_COLLECTION, particao, 'blocos')
+    return {path[-1]: dados for path, dados in db.docs.items() if path[:-1] == prefixo}
+
+
+def test_arquivamento_interrompido_e_retomado_sem_sobrescrever_blocos(fake_db, monkeypatch):
+    monkeypatch.setattr(firestore_service, 'AUDIT_BLOCO_ARQUIVO', 2)
+    ids = _criar_particao(fake_db, '2026-01', _utc(2026, 1, 1), [_utc(2026, 1, d) for d in range(1, 6)])
+    agora = _utc(2026, 10, 19)
+
+    # 1ª execução: o 2º batch falha (erro ou timeout do Cron) no meio da partição
+    fake_db.falhar_no_commit = 2
+    assert firestore_service.arquivar_particoes_antigas(agora) == []
+
+    particao = fake_db.collection(AUDIT_COLLECTION).document('2026-01').get().to_dict()
+    assert particao['status'] == 'arquivando'
+    blocos_antes = _blocos(fake_db, '2026-01')
+    assert len(blocos_antes) == 1
+
+    # 2ª execução: retoma de onde parou
+    fake_db.falhar_no_commit = None
+    assert firestore_service.arquivar_particoes_antigas(agora) == ['2026-01']
+
+    blocos = _blocos(fake_db, '2026-01')
+    assert len(blocos) == 3
+    for bloco_id, dados in blocos_antes.items():
+        assert blocos[bloco_id] == dados  # Bloco já arquivado não foi sobrescrito
+
+    arquivados = [registro['id'] for dados in blocos.values() for registro in dados['registros']]
+    assert sorted(arquivados) == sorted(ids)
+
+    restantes = list(fake_db.collection(AUDIT_COLLECTION).document('2026-01').collection(AUDIT_SUBCOLLECTION).stream())
+    assert restantes == []
+
+    particao = fake_db.collection(AUDIT_COLLECTION).document('2026-01').get().to_dict()
+    assert particao['status'] == 'arquivada'
+    assert particao['total'] == 5
+
+
+def test_particao_dentro_da_retencao_nao_e_arquivada(fake_db):
+    _criar_particao(fake_db, '2026-10', _utc(2026, 10, 1), [_utc(2026, 10, 2)])
+
+    assert firestore_service.arquivar_particoes_antigas(_utc(2026, 10, 19)) == []
+
+
+# ----------------------------------------------------------
+# Migração do formato antigo (coleção plana 'auditoria_logs')
+# ----------------------------------------------------------
+
+def test_migracao_move_logs_legados_para_as_particoes(fake_db):
+    legado = fake_db.collection(AUDIT_LEGACY_COLLECTION)
+    legado.document('a').set({'timestamp': _utc(2026, 9, 5), 'matricula': 'OP001', 'modulo': 'PDV', 'acao': 'Venda'})
+    legado.document('b').set({'timestamp': _utc(2026, 10, 2), 'matricula': 'OP002', 'modulo': 'PDV', 'acao': 'Venda'})
+
+    assert firestore_service.migrar_logs_legados() == 2
+
+    assert list(legado.stream()) == []
+    logs, _ = firestore_service.query_auditoria(inicio=_utc(2026, 9, 1), fim=_utc(2026, 11, 1))
+    assert [(log['particao'], log['id']) for log in logs] == [('2026-10', 'b'), ('2026-09', 'a')]